@@ -1,14 +1,52 @@
 import os
+import sys
+import queue
+import threading
 import can
 
+PRINTBATCH = 64  # most messages written to stdout in one call
+QUEUESIZE = 1024 # messages waiting on the writer thread
+
 can0 = can.interface.Bus(channel= 'can0', bustype = 'socketcan')
 #can0 = can.interface.Bus(channel = 'can0', bustype = 'socketcan')# socketcan_nativewdocker
 
+# Notifier thread drains the socket into the reader so printing never holds up the bus
+reader = can.BufferedReader()
+notifier = can.Notifier(can0, [reader])
+
+printq = queue.Queue(maxsize=QUEUESIZE)
+
+def writer():
+    # formats and writes queued messages; None in the queue means done
+    while True:
+        msg = printq.get()
+        if msg is None:
+            return
+        buf = [str(msg)]
+        # pick up whatever else has arrived so a burst goes out in one write
+        while len(buf) < PRINTBATCH:
+            try:
+                msg = printq.get_nowait()
+            except queue.Empty:
+                break
+            if msg is None:
+                sys.stdout.write("\n".join(buf) + "\n")
+                return
+            buf.append(str(msg))
+        sys.stdout.write("\n".join(buf) + "\n")
+        sys.stdout.flush()
+
+writerthread = threading.Thread(target=writer, daemon=True)
+writerthread.start()
+
 #msg = can.Message(arbitration_id=0x123, data=[0, 1, 2, 3, 4, 5, 6, 7], extended_id=False)
 for x in range(600):
-    msg = can0.recv(10.0)
+    msg = reader.get_message(timeout=10.0)
     if msg is None:
-        print('+++ Timeout occurred, no message.')
+        printq.put('+++ Timeout occurred, no message.')
     else:
-        print (msg)
+        printq.put(msg)
 
+printq.put(None)
+writerthread.join()
+notifier.stop()
@@ -1,9 +1,9 @@
 import sys
 sys.path.append('/home/pi/Code/tblank1024/rv/mqttclient')
 import time
+import threading
 import RPi.GPIO as GPIO
 #from rpi_hardware_pwm import HardwarePWM
-import time
 import logging
 #import mqttclient
 
@@ -17,6 +17,9 @@ import logging
 # pwm.stop()
 
 from enum import Enum
+from types import MappingProxyType
+
+debuglevel = 0      # 0 = quiet; every diagnostic print/log below is behind a debuglevel check
 
 class States(Enum):
     OFF         = 1
@@ -34,18 +37,18 @@ class AlarmTypes(Enum):
 
 class Alarm():
 
-    StateConsts = {
-        # Value list assignments: 1st: Light indicator state; 2nd: Buzzer State; 3rd: Alarm State
+    StateConsts = MappingProxyType({
+        # Value tuple assignments: 1st: Light indicator state; 2nd: Buzzer State; 3rd: Alarm State
         # Value meaning: 0 = off; 1 = on; 4 = slow blink; 16 = fast blink 
 
-        States.OFF:         [ 0,  0,  0],     
-        States.STARTING:    [ 4,  4,  0],
-        States.STARTERROR:  [16, 16,  0],
-        States.ON:          [ 1,  0,  0],
-        States.TRIGDELAY:   [16, 16,  0],
-        States.TRIGGERED:   [16, 16,  1],
-        States.SILENCED:    [16, 16,  0],
-    }
+        States.OFF:         ( 0,  0,  0),     
+        States.STARTING:    ( 4,  4,  0),
+        States.STARTERROR:  (16, 16,  0),
+        States.ON:          ( 1,  0,  0),
+        States.TRIGDELAY:   (16, 16,  0),
+        States.TRIGGERED:   (16, 16,  1),
+        States.SILENCED:    (16, 16,  0),
+    })
 
     #Class Constants
     ENTRYEXITDELAY  = int(30)            # Time in seconds where alarm won't go off after enable
@@ -53,7 +56,24 @@ class Alarm():
     SLOWBLINK       = int(6 * FASTBLINK) # SLOWBLINK must be a multiple of FASTBLINK
     MAXALARMTIME    = int(2)             # Number of minutes max that the alarm can be on
     LOOPDELAY       = float(.3)          # time in seconds pausing between running loop
+    IDLEWAKE        = float(5)           # max seconds to sleep waiting for a button when both alarms are off
+    BUTTONBOUNCE    = int(200)           # edge detect debounce in ms
+    BUTTONDELAY     = int(1)             # Time (sec) after a press before either button acts again
     LOUDENABLE      = True
+    BIKEARMED       = frozenset((States.ON, States.STARTING))   # Bike states where the trip wire is checked
+    STARTUPSTATES   = frozenset((States.STARTING, States.STARTERROR))  # States that time out to ON
+
+    # StateConsts decoded once per (InteriorState, BikeState) pair for _display:
+    # (red light, blue light, combined buzzer, combined alarm, largest of the four)
+    DISPLAYTABLE = {}
+    for _int in States:
+        for _bk in States:
+            _IntLight, _IntBuzz, _IntAlarm = StateConsts[_int]
+            _BkLight,  _BkBuzz,  _BkAlarm  = StateConsts[_bk]
+            _Vals = (_IntLight, _BkLight, _IntBuzz + _BkBuzz, _IntAlarm + _BkAlarm)
+            DISPLAYTABLE[(_int, _bk)] = _Vals + (max(_Vals),)
+    del _int, _bk, _IntLight, _IntBuzz, _IntAlarm, _BkLight, _BkBuzz, _BkAlarm, _Vals
+    DISPLAYTABLE = MappingProxyType(DISPLAYTABLE)
     
     # Pin Definitons using board connector numbering and RP.gpio:
 
@@ -111,6 +131,25 @@ class Alarm():
         GPIO.output(self.BIKEOUT1, False)
         GPIO.output(self.BIKEOUT2, True)
 
+        # Buttons are the only inputs that matter while both alarms are off, so wake on their edges
+        self.ButtonEvent = threading.Event()
+        self.ButtonLock = threading.Lock()
+        self.ButtonLatch = set()                    # button pins with an edge not yet seen by _check_buttons
+        self.Parked = False                         # True while run_alarm_infinite waits on ButtonEvent
+        self.ButtonsUpSince = None                  # LoopTime both buttons were first seen released, None while one is down
+        # Edge detection needs the sysfs gpio interface, which /dev/gpiomem alone (unprivileged container) doesn't give;
+        # without it the alarm still runs, it just keeps the LOOPDELAY tick while idle
+        self.EdgeDetect = False
+        try:
+            GPIO.add_event_detect(self.REDBUTTONIN, GPIO.FALLING, callback=self._on_button, bouncetime=self.BUTTONBOUNCE)
+            try:
+                GPIO.add_event_detect(self.BLUEBUTTONIN, GPIO.FALLING, callback=self._on_button, bouncetime=self.BUTTONBOUNCE)
+            except RuntimeError:
+                GPIO.remove_event_detect(self.REDBUTTONIN)
+                raise
+            self.EdgeDetect = True
+        except RuntimeError as e:
+            print('Button edge detection unavailable, polling buttons instead:', e)
         
         
 
@@ -121,6 +160,15 @@ class Alarm():
         self.InteriorState = States.OFF
 
 
+    def _on_button(self, channel):
+        # called from the GPIO edge detect thread. Only an edge that arrives while parked is latched as a press, so a
+        # short tap that wakes the loop isn't missed; any other time the loop samples the pins every tick, and a
+        # latched release bounce would toggle a second time
+        with self.ButtonLock:
+            if self.Parked and (time.time() - self.LastButtonTime) > self.BUTTONDELAY:
+                self.ButtonLatch.add(channel)
+        self.ButtonEvent.set()
+
     def _toggle(self, outpin):
         outval = GPIO.input(outpin)
         GPIO.output(outpin, not outval)
@@ -129,13 +177,20 @@ class Alarm():
      
     def set_state(self, state_var: AlarmTypes, state_val: States):
         if state_var == AlarmTypes.Interior:
-            self.InteriorState = state_val
-            if state_val == States.STARTING:
-                self.InteriorTime = self.LoopTime
+            self._set_interior(state_val)
         else:
-            self.BikeState = state_val
-            if state_val == States.STARTING:
-                self.BikeTime = self.LoopTime
+            self._set_bike(state_val)
+
+    # Per alarm setters used inside the loop; the alarm type is always known at the call site
+    def _set_interior(self, state_val: States):
+        self.InteriorState = state_val
+        if state_val == States.STARTING:
+            self.InteriorTime = self.LoopTime
+
+    def _set_bike(self, state_val: States):
+        self.BikeState = state_val
+        if state_val == States.STARTING:
+            self.BikeTime = self.LoopTime
 
     def get_state(self, state_var: AlarmTypes) -> States:
         if state_var == AlarmTypes.Interior:
@@ -161,41 +216,50 @@ class Alarm():
 
     
     def _check_bike_wire(self):
-        if self.BikeState in [States.ON, States.STARTING] and self._bikewire_error_chk():
+        if self.BikeState in self.BIKEARMED and self._bikewire_error_chk():
             #two tests show error
             if(self.BikeState == States.STARTING):
                 # Starting errror
-                self.set_state(AlarmTypes.Bike, States.STARTERROR)
+                self._set_bike(States.STARTERROR)
             else:
                 # Alarm triggered 
-                self.set_state(AlarmTypes.Bike, States.TRIGGERED)
+                self._set_bike(States.TRIGGERED)
                 self.AlarmTime = self.LoopTime
     
     def _check_interior(self):
         if self.InteriorState == States.STARTING and GPIO.input(self.PIRSENSORIN): 
              #Alarm triggered but starting
-            self.set_state(AlarmTypes.Interior, States.STARTERROR)
+            self._set_interior(States.STARTERROR)
         elif self.InteriorState == States.ON and GPIO.input(self.PIRSENSORIN): 
             #Alarm triggered
-            self.set_state(AlarmTypes.Interior, States.TRIGDELAY)
+            self._set_interior(States.TRIGDELAY)
             self.AlarmTime = self.LoopTime
             if debuglevel > 0:
                 logging.info("Interior Alarm triggered")
 
     def _check_buttons(self):
-        BUTTONDELAY = 1             # Time (sec) before button _toggle((s
+        BUTTONDELAY = self.BUTTONDELAY
 
         NowTime = self.LoopTime
-        RedButton = GPIO.input(self.REDBUTTONIN)     #Interior Alarm control
-        BlueButton = GPIO.input(self.BLUEBUTTONIN)    #Bike Alarm control
+        with self.ButtonLock:
+            Latched = self.ButtonLatch
+            self.ButtonLatch = set()
+        # a latched edge counts as pressed; otherwise fall back to the pin so a held button still registers
+        RedButton = 0 if self.REDBUTTONIN in Latched else GPIO.input(self.REDBUTTONIN)       #Interior Alarm control
+        BlueButton = 0 if self.BLUEBUTTONIN in Latched else GPIO.input(self.BLUEBUTTONIN)    #Bike Alarm control
+        if RedButton and BlueButton:
+            if self.ButtonsUpSince is None:
+                self.ButtonsUpSince = NowTime
+        else:
+            self.ButtonsUpSince = None
         
         if(RedButton == 0 and ((NowTime-self.LastButtonTime) > BUTTONDELAY)): 
             if self.InteriorState == States.OFF:
-                self.set_state(AlarmTypes.Interior,States.STARTING)
+                self._set_interior(States.STARTING)
                 if debuglevel > 0:
                     logging.info("Red Starting")
             else:
-                self.set_state(AlarmTypes.Interior,States.OFF)
+                self._set_interior(States.OFF)
                 if debuglevel > 0:
                     logging.info("Red Stopping")
             self.LastButtonTime = NowTime
@@ -203,34 +267,33 @@ class Alarm():
         if BlueButton == 0 and ((NowTime-self.LastButtonTime) > BUTTONDELAY): 
             #_toggle((
             if self.BikeState == States.OFF:
-                self.set_state(AlarmTypes.Bike, States.STARTING)
+                self._set_bike(States.STARTING)
                 if debuglevel > 0:
                     logging.info("Blue Starting")
             else:
-                self.set_state(AlarmTypes.Bike, States.OFF)
+                self._set_bike(States.OFF)
                 if debuglevel > 0:
                     logging.info("Blue Stopping")
             self.LastButtonTime = NowTime
 
     def _display(self):
-        global debuglevel
         
-        IntState    = self.StateConsts[self.InteriorState]
-        BkState     = self.StateConsts[self.BikeState]
+        IntLight, BkLight, BuzzerVal, AlarmVal, MaxVal = self.DISPLAYTABLE[(self.InteriorState, self.BikeState)]
+        Loud = self.LOUDENABLE
         mytime = time.localtime()
         NightTime =  mytime.tm_hour < 8 or mytime.tm_hour > 20
 
-        if IntState[0] == 0:
+        if IntLight == 0:
             GPIO.output(self.REDLEDOUT, 0) #Red light off
-        elif IntState[0] == 1:
+        elif IntLight == 1:
             #Red light on
             if NightTime:
                 GPIO.output(self.REDLEDOUT,1)    #dim on
             else:
                 GPIO.output(self.REDLEDOUT,100)    #strong on
-        if BkState[0] == 0:
+        if BkLight == 0:
             GPIO.output(self.BLUELEDOUT, 0) #Blue light off
-        elif BkState[0] == 1:
+        elif BkLight == 1:
             #Blue light on
             if NightTime:
                 GPIO.output(self.BLUELEDOUT,1)    #Dim on
@@ -238,59 +301,47 @@ class Alarm():
                 GPIO.output(self.BLUELEDOUT,100)  #strong on
 
         
-        # Combined Buzzer and Alarm values
-        BuzzerVal = IntState[1] + BkState[1]
-        AlarmVal = IntState[2] + BkState[2]
-
         if BuzzerVal == 0:
             GPIO.output(self.BUZZEROUT, 0)
         elif BuzzerVal == 1:
-            if self.LOUDENABLE:
+            if Loud:
                     GPIO.output(self.BUZZEROUT, 1)
             #TINK.setLED(self.TINKERADDR,0)
         
         if AlarmVal == 0:
             GPIO.output(self.HORNOUT, 0)
         elif AlarmVal == 1:
-            if self.LOUDENABLE:
+            if Loud:
                 GPIO.output(self.HORNOUT, 1)
             #TINK.setDOUT(self.TINKERADDR,6)
 
-        if BuzzerVal > 1 or AlarmVal > 1 or IntState[0] > 1 or BkState[0] > 1:
-             # Someone needs to _toggle(( now
-            if self.LoopCount % self.SLOWBLINK == 0:
-                if IntState[0] > 2:            # Red Light
-                    self.RedPWMVal = (self.RedPWMVal+50) % 100
-                    GPIO.output(self.REDLEDOUT,self.RedPWMVal)
-                if BkState[0] > 2:                # Blue Light
-                    self.BluePWMVal = (self.BluePWMVal + 50) % 100
-                    GPIO.output(self.BLUELEDOUT, self.BluePWMVal)
-                if BuzzerVal > 2:
-                    if self.LOUDENABLE:
-                        self._toggle(self.BUZZEROUT)
-                    #TINK._toggle((LED(self.TINKERADDR,0)
-                if AlarmVal > 2:
-                    if self.LOUDENABLE:
-                        self._toggle(self.HORNOUT)
-                    #TINK._toggle((DOUT(self.TINKERADDR,6)
-            elif (self.LoopCount % self.FASTBLINK) == 0:
-                if IntState[0] > 8:            # Red Light
+        if MaxVal > 1:
+             # Someone needs to _toggle(( now; slow tick toggles slow and fast blinkers, fast tick only fast ones
+            LoopCount = self.LoopCount
+            if LoopCount % self.SLOWBLINK == 0:
+                Blink = 2
+            elif (LoopCount % self.FASTBLINK) == 0:
+                Blink = 8
+            else:
+                Blink = None
+            if Blink is not None:
+                if IntLight > Blink:            # Red Light
                     self.RedPWMVal = (self.RedPWMVal+50) % 100
                     GPIO.output(self.REDLEDOUT,self.RedPWMVal)
-                if BkState[0] > 8:                # Blue Light
+                if BkLight > Blink:                # Blue Light
                     self.BluePWMVal = (self.BluePWMVal + 50) % 100
                     GPIO.output(self.BLUELEDOUT, self.BluePWMVal)
-                if BuzzerVal > 8:
-                    if self.LOUDENABLE:
+                if BuzzerVal > Blink:
+                    if Loud:
                         self._toggle(self.BUZZEROUT)
                     #TINK._toggle((LED(self.TINKERADDR,0)
-                if AlarmVal > 8:
-                    if self.LOUDENABLE:
+                if AlarmVal > Blink:
+                    if Loud:
                         self._toggle(self.HORNOUT)
                     #TINK._toggle((DOUT(self.TINKERADDR,6)
         if debuglevel == 1:
             if self.LoopCount % 3 == 0:
-                print (IntState, "\t", BkState, "\t", AlarmVal, "\t\t", BuzzerVal, "\t\t", GPIO.input(self.BIKEIN1), "\t", GPIO.input(self.BIKEIN2))
+                print (self.StateConsts[self.InteriorState], "\t", self.StateConsts[self.BikeState], "\t", AlarmVal, "\t\t", BuzzerVal, "\t\t", GPIO.input(self.BIKEIN1), "\t", GPIO.input(self.BIKEIN2))
             if self.LoopCount % 50 == 1:
                 print("IntState\tBkState \tAlarmVal\tBuzzerVal\tBike1\tBike2")
                 
@@ -302,26 +353,26 @@ class Alarm():
 
         
         Inside = self.InteriorState
-        if Inside in [States.STARTING, States.STARTERROR] and (self.LoopTime - self.InteriorTime) > self.ENTRYEXITDELAY:
+        if Inside in self.STARTUPSTATES and (self.LoopTime - self.InteriorTime) > self.ENTRYEXITDELAY:
             #self.InteriorState = States.ON
-            self.set_state(AlarmTypes.Interior, States.ON)
+            self._set_interior(States.ON)
     
         elif (Inside ==  States.TRIGDELAY) and ((self.LoopTime - self.AlarmTime) > self.ENTRYEXITDELAY):
             #self.InternalState = States.TRIGGERED
-            self.set_state(AlarmTypes.Interior, States.TRIGGERED)
+            self._set_interior(States.TRIGGERED)
       
         elif (Inside ==  States.TRIGGERED) and ((self.LoopTime - self.AlarmTime) > (60 * self.MAXALARMTIME)):
             #self.InternalState = States.SILENCED
-            self.set_state(AlarmTypes.Interior, States.SILENCED)   
+            self._set_interior(States.SILENCED)   
        
         Bike = self.BikeState
-        if (Bike in [States.STARTING, States.STARTERROR]) and (self.LoopTime - self.BikeTime) > self.ENTRYEXITDELAY:
+        if (Bike in self.STARTUPSTATES) and (self.LoopTime - self.BikeTime) > self.ENTRYEXITDELAY:
             #self.BikeState = States.ON
-            self.set_state(Bike, States.ON)
+            self._set_bike(States.ON)
       
         elif (Bike ==  States.TRIGGERED) and ((self.LoopTime - self.AlarmTime) > (60 * self.MAXALARMTIME)):
             #self.BikeState = States.SILENCED
-            self.set_state(Bike, States.SILENCED)
+            self._set_bike(States.SILENCED)
 
     def _InternalTest(self):
         #blink red and blue leds
@@ -367,6 +418,18 @@ class Alarm():
                 self._display()
                 #if LoopCount % 40 == 0:
                 #    print(AlarmState)
+                # nothing to poll until a button is pressed. Keep ticking through the button hold off so a held button
+                # still counts, and until both buttons were already up on an earlier tick so any release bounce is over
+                if self.EdgeDetect and debuglevel == 0 and self.InteriorState == States.OFF and self.BikeState == States.OFF \
+                        and (self.LoopTime - self.LastButtonTime) > self.BUTTONDELAY \
+                        and self.ButtonsUpSince is not None and (self.LoopTime - self.ButtonsUpSince) >= self.LOOPDELAY:
+                    self.ButtonEvent.clear()
+                    with self.ButtonLock:
+                        self.Parked = True
+                    self.ButtonEvent.wait(self.IDLEWAKE)
+                    with self.ButtonLock:
+                        self.Parked = False
+                    continue
             time.sleep(self.LOOPDELAY) #sleep
 
 if __name__ == "__main__":
@@ -1,12 +1,12 @@
 import piplates.TINKERplate as TINK
 import time
 import RPi.GPIO as GPIO
-import time
 
 
 
 
 from enum import Enum
+from types import MappingProxyType
 
 class States(Enum):
     OFF         = 1
@@ -24,18 +24,18 @@ class AlarmTypes(Enum):
 
 class Alarm:
 
-    StateConsts = {
-        # Value list assignments: 1st: Light indicator state; 2nd: Buzzer State; 3rd: Alarm State
+    StateConsts = MappingProxyType({
+        # Value tuple assignments: 1st: Light indicator state; 2nd: Buzzer State; 3rd: Alarm State
         # Value meaning: 0 = off; 1 = on; 4 = slow blink; 16 = fast blink 
 
-        States.OFF:         [ 0,  0,  0],     
-        States.STARTING:    [ 4,  4,  0],
-        States.STARTERROR:  [16, 16,  0],
-        States.ON:          [ 1,  0,  0],
-        States.TRIGDELAY:   [16, 16,  0],
-        States.TRIGGERED:   [16, 16,  1],
-        States.SILENCED:    [16, 16,  0]
-    }
+        States.OFF:         ( 0,  0,  0),     
+        States.STARTING:    ( 4,  4,  0),
+        States.STARTERROR:  (16, 16,  0),
+        States.ON:          ( 1,  0,  0),
+        States.TRIGDELAY:   (16, 16,  0),
+        States.TRIGGERED:   (16, 16,  1),
+        States.SILENCED:    (16, 16,  0)
+    })
 
     #Class Constants
     ENTRYEXITDELAY  = int(30)            # Time in seconds where alarm won't go off after enable
@@ -47,6 +47,22 @@ class Alarm:
     BUZZER          = 1
     ALARMHORN       = 2
     LOUDENABLE      = True
+    BIKEARMED       = frozenset((States.ON, States.STARTING))   # Bike states where the trip wire is checked
+    STARTUPSTATES   = frozenset((States.STARTING, States.STARTERROR))  # States that time out to ON
+
+    # StateConsts decoded once per (InteriorState, BikeState) pair for _display:
+    # (red light, blue light, combined buzzer, combined alarm, largest of the four)
+    DISPLAYTABLE = {}
+    for _int in States:
+        for _bk in States:
+            _IntLight, _IntBuzz, _IntAlarm = StateConsts[_int]
+            _BkLight,  _BkBuzz,  _BkAlarm  = StateConsts[_bk]
+            _Vals = (_IntLight, _BkLight, _IntBuzz + _BkBuzz, _IntAlarm + _BkAlarm)
+            DISPLAYTABLE[(_int, _bk)] = _Vals + (max(_Vals),)
+    del _int, _bk, _IntLight, _IntBuzz, _IntAlarm, _BkLight, _BkBuzz, _BkAlarm, _Vals
+    DISPLAYTABLE = MappingProxyType(DISPLAYTABLE)
+    CHAN3RATIO      = 0.6666             # Trip wire ADC channel 3 nominal / 5V supply, set by resistive divider
+    CHAN4RATIO      = 0.3333             # Trip wire ADC channel 4 nominal / 5V supply
     # Pin Definitons:
     PIRSensor = 17 # Broadcom pin 17 (P1 pin 11)
 
@@ -71,28 +87,60 @@ class Alarm:
         TINK.setMODE(self.TINKERADDR,4,'DOUT')    # Blue LED
         TINK.setMODE(self.TINKERADDR,5,'DIN')     # PIR interior sensor 
         TINK.setMODE(self.TINKERADDR,6,'DOUT')    # Surrogate for Alarm horn
-        TINK.clrLED(self.TINKERADDR,0)            # Note LED0 is surrogate for buzzer 
-        TINK.clrDOUT(self.TINKERADDR,2)           # Red LED
-        TINK.clrDOUT(self.TINKERADDR,4)           # Blue LED
-        TINK.clrDOUT(self.TINKERADDR,6)           # Surrogate Alarm horn
-        TINK.relayOFF(self.TINKERADDR, self.BUZZER)   # Alarm Horn
-        TINK.relayOFF(self.TINKERADDR, self.ALARMHORN)# Buzzer
+        self.OutState = {}                        # last value written to each TINKERplate output
+        self._set_out('LED', 0, 0)                # Note LED0 is surrogate for buzzer 
+        self._set_out('DOUT', 2, 0)               # Red LED
+        self._set_out('DOUT', 4, 0)               # Blue LED
+        self._set_out('DOUT', 6, 0)               # Surrogate Alarm horn
+        self._set_out('RELAY', self.BUZZER, 0)    # Alarm Horn
+        self._set_out('RELAY', self.ALARMHORN, 0) # Buzzer
         
         self.BikeState = States.OFF
         self.InteriorState = States.OFF
         # Pin Setup:
         GPIO.setmode(GPIO.BCM) # Broadcom pin-numbering scheme
         GPIO.setup(self.PIRSensor, GPIO.IN) # 
+
+    def _set_out(self, kind, chan, val):
+        # Only do a TINKERplate (SPI) write when the output actually changes
+        key = (kind, chan)
+        if self.OutState.get(key) == val:
+            return
+        self.OutState[key] = val
+        if kind == 'DOUT':
+            (TINK.setDOUT if val else TINK.clrDOUT)(self.TINKERADDR, chan)
+        elif kind == 'LED':
+            (TINK.setLED if val else TINK.clrLED)(self.TINKERADDR, chan)
+        else:
+            (TINK.relayON if val else TINK.relayOFF)(self.TINKERADDR, chan)
+
+    def _toggle_out(self, kind, chan):
+        key = (kind, chan)
+        if kind == 'DOUT':
+            TINK.toggleDOUT(self.TINKERADDR, chan)
+        elif kind == 'LED':
+            TINK.toggleLED(self.TINKERADDR, chan)
+        else:
+            TINK.relayTOGGLE(self.TINKERADDR, chan)
+        if key in self.OutState:
+            self.OutState[key] = 1 - self.OutState[key]
      
     def set_state(self, state_var: AlarmTypes, state_val: States):
         if state_var == AlarmTypes.Interior:
-            self.InteriorState = state_val
-            if state_val == States.STARTING:
-                self.InteriorTime = self.LoopTime
+            self._set_interior(state_val)
         else:
-            self.BikeState = state_val
-            if state_val == States.STARTING:
-                self.BikeTime = self.LoopTime
+            self._set_bike(state_val)
+
+    # Per alarm setters used inside the loop; the alarm type is always known at the call site
+    def _set_interior(self, state_val: States):
+        self.InteriorState = state_val
+        if state_val == States.STARTING:
+            self.InteriorTime = self.LoopTime
+
+    def _set_bike(self, state_val: States):
+        self.BikeState = state_val
+        if state_val == States.STARTING:
+            self.BikeTime = self.LoopTime
 
     def get_state(self, state_var: AlarmTypes) -> States:
         if state_var == AlarmTypes.Interior:
@@ -102,124 +150,115 @@ class Alarm:
          
     def _check_bike_wire(self):
         VOL_DELTA = .2              #Allowed voltage delta in trip wire
-        if self.BikeState in [States.ON, States.STARTING]:
+        if self.BikeState in self.BIKEARMED:         #no ADC traffic while the bike alarm is disarmed
             Chan1_Base = TINK.getADC(self.TINKERADDR,1)    #This measures the 5V supply used to generate Chan3_Base and Chan4_Base 
-            Chan3_Base = Chan1_Base * 0.6666        #ratio set by resistive divider
-            Chan4_Base = Chan1_Base * 0.3333
-            Chan3 = abs(TINK.getADC(self.TINKERADDR,3) - Chan3_Base)
-            Chan4 = abs(TINK.getADC(self.TINKERADDR,4) - Chan4_Base)
-            if (Chan3 > VOL_DELTA) or (Chan4 > VOL_DELTA):
+            Chan3_Base = Chan1_Base * self.CHAN3RATIO
+            Chan4_Base = Chan1_Base * self.CHAN4RATIO
+            # channel 4 is only read when channel 3 is in range; either one out of range is an error
+            if not (Chan3_Base - VOL_DELTA <= TINK.getADC(self.TINKERADDR,3) <= Chan3_Base + VOL_DELTA) or \
+               not (Chan4_Base - VOL_DELTA <= TINK.getADC(self.TINKERADDR,4) <= Chan4_Base + VOL_DELTA):
                 # Error detected 
                 if(self.BikeState == States.STARTING):
                     # Starting errror
                     #self.BikeState = States.STARTERROR
-                    self.set_state(AlarmTypes.Bike, States.STARTERROR)
+                    self._set_bike(States.STARTERROR)
                 else:
                     # Alarm triggere; 
                     #self.BikeState = States.TRIGGERED   #Note: Bike has no alarm triggered delay.
-                    self.set_state(AlarmTypes.Bike, States.TRIGGERED)
+                    self._set_bike(States.TRIGGERED)
                     self.AlarmTime = self.LoopTime
 
 
     def _check_interior(self):
         if self.InteriorState == States.STARTING and GPIO.input(self.PIRSensor): 
              #Alarm triggered but starting
-            self.set_state(AlarmTypes.Interior, States.STARTERROR)
+            self._set_interior(States.STARTERROR)
         if self.InteriorState == States.ON and GPIO.input(self.PIRSensor): 
             #Alarm triggered
-            self.set_state(AlarmTypes.Interior, States.TRIGDELAY)
+            self._set_interior(States.TRIGDELAY)
             self.AlarmTime = self.LoopTime
 
     def _check_buttons(self):
         BUTTONDELAY = 1             # Time (sec) before button toggles
 
         NowTime = self.LoopTime
-        RedButton = TINK.getBUTTON(self.TINKERADDR,1)     #Interior Alarm control
-        BlueButton = TINK.getBUTTON(self.TINKERADDR,3)    #Bike Alarm control
-        
-        if(RedButton == 1 and ((NowTime-self.LastButtonTime) > BUTTONDELAY)): 
+        if (NowTime-self.LastButtonTime) <= BUTTONDELAY:
+            return                                              # neither button can act yet, so skip the SPI reads
+
+        if TINK.getBUTTON(self.TINKERADDR,1) == 1:              #Interior Alarm control
             #Toggle
             if self.InteriorState == States.OFF:
                 #self.InteriorState = States.STARTING
                 #self.InteriorTime = NowTime
-                self.set_state(AlarmTypes.Interior,States.STARTING)
+                self._set_interior(States.STARTING)
             else:
                 #self.InteriorState = States.OFF
-                self.set_state(AlarmTypes.Interior,States.OFF)
+                self._set_interior(States.OFF)
             self.LastButtonTime = NowTime
+            return                                              # blue is inside the hold off now, no need to read it
 
-        if BlueButton == 1 and ((NowTime-self.LastButtonTime) > BUTTONDELAY): 
+        if TINK.getBUTTON(self.TINKERADDR,3) == 1:              #Bike Alarm control
             #Toggle
             if self.BikeState == States.OFF:
                 #self.BikeState = States.STARTING 
                 #self.BikeTime = NowTime
-                self.set_state(AlarmTypes.Bike,States.STARTING)
+                self._set_bike(States.STARTING)
             else:
                 #self.BikeState = States.OFF
-                self.set_state(AlarmTypes.Bike, States.OFF)
+                self._set_bike(States.OFF)
             self.LastButtonTime = NowTime
 
     def _display(self):
     
-        IntState    = self.StateConsts[self.InteriorState]
-        BkState     = self.StateConsts[self.BikeState]
-        if IntState[0] == 0:
-            TINK.clrDOUT(self.TINKERADDR,2) #Red light off
-        elif IntState[0] == 1:
-            TINK.setDOUT(self.TINKERADDR,2) #Red light off
-        if BkState[0] == 0:
-            TINK.clrDOUT(self.TINKERADDR,4) #Blue light off
-        elif BkState[0] == 1:
-            TINK.setDOUT(self.TINKERADDR,4) #Blue light off
+        IntLight, BkLight, BuzzerVal, AlarmVal, MaxVal = self.DISPLAYTABLE[(self.InteriorState, self.BikeState)]
+        Loud = self.LOUDENABLE
+        if IntLight == 0:
+            self._set_out('DOUT', 2, 0) #Red light off
+        elif IntLight == 1:
+            self._set_out('DOUT', 2, 1) #Red light on
+        if BkLight == 0:
+            self._set_out('DOUT', 4, 0) #Blue light off
+        elif BkLight == 1:
+            self._set_out('DOUT', 4, 1) #Blue light on
         
-        # Combined Buzzer and Alarm values
-        BuzzerVal = IntState[1] + BkState[1]
-        AlarmVal = IntState[2] + BkState[2]
-
         if BuzzerVal == 0:
-            TINK.relayOFF(self.TINKERADDR, self.BUZZER)
-            TINK.clrLED(self.TINKERADDR,0)
+            self._set_out('RELAY', self.BUZZER, 0)
+            self._set_out('LED', 0, 0)
         elif BuzzerVal == 1:
-            if self.LOUDENABLE:
-                    TINK.relayON(self.TINKERADDR,self.BUZZER)
-            TINK.setLED(self.TINKERADDR,0)
+            if Loud:
+                    self._set_out('RELAY', self.BUZZER, 1)
+            self._set_out('LED', 0, 1)
         
         if AlarmVal == 0:
-            TINK.relayOFF(self.TINKERADDR,self.ALARMHORN)
-            TINK.clrDOUT(self.TINKERADDR,6)
+            self._set_out('RELAY', self.ALARMHORN, 0)
+            self._set_out('DOUT', 6, 0)
         elif AlarmVal == 1:
-            if self.LOUDENABLE:
-                TINK.relayON(self.TINKERADDR,self.ALARMHORN)
-            TINK.setDOUT(self.TINKERADDR,6)
-
-        if BuzzerVal > 1 or AlarmVal > 1 or IntState[0] > 1 or BkState[0] > 1:
-             # Someone needs to toggle now
-            if self.LoopCount % self.SLOWBLINK == 0:
-                if IntState[0] > 2:            # Red Light
-                    TINK.toggleDOUT(self.TINKERADDR,2)
-                if BkState[0] > 2:                # Blue Light
-                    TINK.toggleDOUT(self.TINKERADDR,4)
-                if BuzzerVal > 2:
-                    if self.LOUDENABLE:
-                        TINK.relayTOGGLE(self.TINKERADDR,self.BUZZER)
-                    TINK.toggleLED(self.TINKERADDR,0)
-                if AlarmVal > 2:
-                    if self.LOUDENABLE:
-                        TINK.relayTOGGLE(self.TINKERADDR,self.ALARMHORN)
-                    TINK.toggleDOUT(self.TINKERADDR,6)
-            elif (self.LoopCount % self.FASTBLINK) == 0:
-                if IntState[0] > 8:            # Red Light
-                    TINK.toggleDOUT(self.TINKERADDR,2)
-                if BkState[0] > 8:                # Blue Light
-                    TINK.toggleDOUT(self.TINKERADDR,4)
-                if BuzzerVal > 8:
-                    if self.LOUDENABLE:
-                        TINK.relayTOGGLE(self.TINKERADDR,self.BUZZER)
-                    TINK.toggleLED(self.TINKERADDR,0)
-                if AlarmVal > 8:
-                    if self.LOUDENABLE:
-                        TINK.relayTOGGLE(self.TINKERADDR,self.ALARMHORN)
-                    TINK.toggleDOUT(self.TINKERADDR,6)
+            if Loud:
+                self._set_out('RELAY', self.ALARMHORN, 1)
+            self._set_out('DOUT', 6, 1)
+
+        if MaxVal > 1:
+             # Someone needs to toggle now; slow tick toggles slow and fast blinkers, fast tick only fast ones
+            LoopCount = self.LoopCount
+            if LoopCount % self.SLOWBLINK == 0:
+                Blink = 2
+            elif (LoopCount % self.FASTBLINK) == 0:
+                Blink = 8
+            else:
+                Blink = None
+            if Blink is not None:
+                if IntLight > Blink:            # Red Light
+                    self._toggle_out('DOUT', 2)
+                if BkLight > Blink:                # Blue Light
+                    self._toggle_out('DOUT', 4)
+                if BuzzerVal > Blink:
+                    if Loud:
+                        self._toggle_out('RELAY', self.BUZZER)
+                    self._toggle_out('LED', 0)
+                if AlarmVal > Blink:
+                    if Loud:
+                        self._toggle_out('RELAY', self.ALARMHORN)
+                    self._toggle_out('DOUT', 6)
                 
 
        
@@ -229,26 +268,26 @@ class Alarm:
 
         
         Inside = self.InteriorState
-        if Inside in [States.STARTING, States.STARTERROR] and (self.LoopTime - self.InteriorTime) > self.ENTRYEXITDELAY:
+        if Inside in self.STARTUPSTATES and (self.LoopTime - self.InteriorTime) > self.ENTRYEXITDELAY:
             #self.InteriorState = States.ON
-            self.set_state(AlarmTypes.Interior, States.ON)
+            self._set_interior(States.ON)
     
         elif (Inside ==  States.TRIGDELAY) and ((self.LoopTime - self.AlarmTime) > self.ENTRYEXITDELAY):
             #self.InternalState = States.TRIGGERED
-            self.set_state(AlarmTypes.Interior, States.TRIGGERED)
+            self._set_interior(States.TRIGGERED)
       
         elif (Inside ==  States.TRIGGERED) and ((self.LoopTime - self.AlarmTime) > (60 * self.MAXALARMTIME)):
             #self.InternalState = States.SILENCED
-            self.set_state(AlarmTypes.Interior, States.SILENCED)   
+            self._set_interior(States.SILENCED)   
        
         Bike = self.BikeState
-        if (Bike in [States.STARTING, States.STARTERROR]) and (self.LoopTime - self.BikeTime) > self.ENTRYEXITDELAY:
+        if (Bike in self.STARTUPSTATES) and (self.LoopTime - self.BikeTime) > self.ENTRYEXITDELAY:
             #self.BikeState = States.ON
-            self.set_state(Bike, States.ON)
+            self._set_bike(States.ON)
       
         elif (Bike ==  States.TRIGGERED) and ((self.LoopTime - self.AlarmTime) > (60 * self.MAXALARMTIME)):
             #self.BikeState = States.SILENCED
-            self.set_state(Bike, States.SILENCED)
+            self._set_bike(States.SILENCED)
     
     def run_alarm_infinite(self):
         # run alarm code forever
@@ -204,8 +204,8 @@ async def OneClient(address1, char_uuid):  # need unique address and service add
 
     await client1.start_notify(char_uuid, notification_handler_battery)
     
-    while True:
-        await asyncio.sleep(5.0)
+    # data arrives through the notification callback; park here until cancelled
+    await asyncio.Event().wait()
     
         
 
@@ -223,8 +223,8 @@ async def TwoClient(address1, address2, char_uuid):  # need unique address and s
         await client1.start_notify(char_uuid, notification_handler_battery)
         await client2.start_notify(char_uuid, notification_handler_battery)
 
-        while True:
-            await asyncio.sleep(5.0)
+        # data arrives through the notification callback; park here until cancelled
+        await asyncio.Event().wait()
     except KeyboardInterrupt:
         print("Caught KyBd interrupt")
     finally: 
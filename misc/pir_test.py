@@ -4,28 +4,31 @@ import time
 
 # Pin Definitons:
 PIRSensor = 17 # Broadcom pin 17 (P1 pin 11)
+DISPLAYDELAY = 5 # seconds between updates of the time since last event
 
 
 # Pin Setup:
 GPIO.setmode(GPIO.BCM) # Broadcom pin-numbering scheme
-GPIO.setup(PIRSensor, GPIO.IN) # 
+GPIO.setup(PIRSensor, GPIO.IN) #
+
+last_event = time.time()
+
+def pir_event(channel):
+    # called from the GPIO edge detect thread when the PIR detects movement
+    global last_event
+    last_event = time.time()
+    new_var = time.strftime("Event: %Y/%m/%d %H:%M:%S")
+    print("\n",new_var)
+
+# kernel edge detection replaces polling the pin; bouncetime stands in for the old 3 sec hold off
+GPIO.add_event_detect(PIRSensor, GPIO.RISING, callback=pir_event, bouncetime=3000)
 
-count = 0
 print("Here we go! Press CTRL+C to exit")
 try:
     while 1:
-        if GPIO.input(PIRSensor): # PIR has detected movement
-            #print("Button pressed)")
-            new_var = time.strftime("Event: %Y/%m/%d %H:%M:%S")
-            print("\n",new_var)
-            time.sleep(3.0)
-            count = 0
-
-        else: # button is pressed:
-            count += 1
-            print("Delta Seconds = ", count, " Hours = ", round(count/3600,2), end='\r')
-
-        time.sleep(1.0)
+        time.sleep(DISPLAYDELAY)
+        count = int(time.time() - last_event)
+        print("Delta Seconds = ", count, " Hours = ", round(count/3600,2), end='\r')
 except KeyboardInterrupt: # If CTRL+C is pressed, exit cleanly
     GPIO.cleanup()
     print("finished")
@@ -1,42 +1,64 @@
 #mqtt client to read values of interest from broker
 
-import os, argparse,  time, random, json
+import os, sys, argparse,  time, random, json
 import re       # regular expressions   
+import threading
 import paho.mqtt.client as mqtt
 from pprint import pprint
+try:
+    import orjson                       # optional: faster payload decode if installed
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads             # stdlib json also accepts the raw bytes payload
 
 
 #globals
 topic_prefix = 'RVC'
-msg_counter = 0
+UIREFRESH = 1.0         #min seconds between debug UI refreshes
+UIUpdate = threading.Event()     #set by _on_message when AliasData has new values
+AliasLock = threading.Lock()
 TargetTopics = {}
 MQTTNameToAliasName = {}
 AliasData = {}
+TopicPlan = {}          #topic -> tuple of (item, alias name) pairs used by _on_message
 client = None
+CONNECTTRIES = 5       #attempts to reach the broker before exiting
 mode = 'sub'
 debug = 0
 
 class mqttclient():
 
     def __init__(self, initmode, mqttbroker,mqttport, varIDstr, topic_prefix, debug):
-        global client, AllData, AliasData, MQTTNameToAliasName, TargetTopics, mode
+        global client, AllData, AliasData, MQTTNameToAliasName, TargetTopics, TopicPlan, mode
 
         mode = initmode
 
+        idlen = len(varIDstr)            # var id prefix is compared by slice instead of startswith
         for item in AllData:
             #instance number is included in key but not topic prefix
             topic = topic_prefix + '/' + item
             
             for entryvar in AllData[item]:
                 tmp = AllData[item][entryvar]
-                if  isinstance(tmp, str) and tmp.startswith(varIDstr):
+                if type(tmp) is str and tmp[:idlen] == varIDstr:
                     if topic not in TargetTopics:
                         TargetTopics[topic] = {}
                     TargetTopics[topic][entryvar] = tmp
                     local_topic = topic + '/' + entryvar
                     AliasData[tmp] = 3.14
                     MQTTNameToAliasName[local_topic] = tmp
-        if debug > 0:
+
+        # precompute the alias lookups for each topic so _on_message doesn't rebuild topic/item keys per msg
+        for topic in TargetTopics:
+            plan = []
+            for item in TargetTopics[topic]:
+                if item == 'instance':
+                    break
+                plan.append((item, MQTTNameToAliasName[topic + '/' + item]))
+            TopicPlan[topic] = tuple(plan)
+
+        if debug > 1:
+            # startup dump of the static topic tables is only useful when chasing a json/topic problem
             #print('>>All Data:')
             #pprint(AllData)
             print('>>TargetTopics:')
@@ -52,11 +74,18 @@ class mqttclient():
         client.on_connect = self._on_connect
         client.on_message = self._on_message
 
-        try:
-            client.connect(mqttbroker,mqttport, 60)
-        except:
-            print("Can't connect to MQTT Broker/port -- exiting",mqttbroker,":",mqttport)
-            exit()
+        # back off between attempts so a broker that is still starting doesn't cause a restart storm
+        for attempt in range(CONNECTTRIES):
+            try:
+                client.connect(mqttbroker,mqttport, 60)
+                break
+            except OSError as e:
+                print("Can't connect to MQTT Broker/port",mqttbroker,":",mqttport, e)
+                if attempt < CONNECTTRIES - 1:
+                    time.sleep(min(2**attempt, 30))
+        else:
+            print("Giving up on MQTT Broker/port -- exiting",mqttbroker,":",mqttport)
+            sys.exit(2)
 
         
 
@@ -83,28 +112,32 @@ class mqttclient():
 
     # The callback for when a PUBLISH message is received from the MQTT server.
     def _on_message(self, client, userdata, msg):
-        global TargetTopics, msg_counter, AliasData, MQTTNameToAliasName
+        global TopicPlan, AliasData
         if debug>2:
             print(msg.topic+ " " + str(msg.payload))
-        msg_dict = json.loads(msg.payload.decode('utf-8'))
+        msg_dict = json_loads(msg.payload)
 
-        for item in TargetTopics[msg.topic]:
-            if item == 'instance':
-                break
-            if debug>2:
-                print('*** ',item,'= ', msg_dict[item])
-            tmp = msg.topic + '/' + item
-            AliasData[MQTTNameToAliasName[tmp]] = msg_dict[item]
+        with AliasLock:
+            for item, alias in TopicPlan[msg.topic]:
+                if debug>2:
+                    print('*** ',item,'= ', msg_dict[item])
+                AliasData[alias] = msg_dict[item]
 
         if debug > 0 and debug < 3:
-            #This is a poor way to provide a UI but tkinter isn't working
-            msg_counter += 1
-            if msg_counter % 20 == 0:
-                #os.system('clear')
-                print('*******************************************************')
-                pprint(AliasData)
-                os.sys.stdout.flush()
-                msg_counter = 0
+            UIUpdate.set()
+
+    def _ui_loop(self):
+        # This is a poor way to provide a UI but tkinter isn't working
+        # Runs apart from paho's network thread so printing never holds up message dispatch
+        while True:
+            UIUpdate.wait()
+            UIUpdate.clear()
+            with AliasLock:
+                snapshot = dict(AliasData)
+            print('*******************************************************')
+            pprint(snapshot)
+            os.sys.stdout.flush()
+            time.sleep(UIREFRESH)
     
     @staticmethod
     def pub(payload, qos=0, retain=False):
@@ -124,7 +157,15 @@ class mqttclient():
                 
     def run_mqtt_infinite(self):
         global client
-        client.loop_forever()
+        # paho runs the network loop on its own thread, leaving this thread free for the debug UI
+        client.loop_start()
+        try:
+            if debug > 0 and debug < 3:
+                self._ui_loop()
+            else:
+                threading.Event().wait()
+        finally:
+            client.loop_stop()
 
 AllData = {
     "CHARGER_AC_STATUS_1/1": {"data": "017009187D001EFF",
@@ -1,21 +1,63 @@
 #mqtt client to read values of interest from broker
 
-import os, argparse,  time, random, json
+import os, sys, argparse,  time, random, json, pickle
 import re       # regular expressions   
+import threading
 import paho.mqtt.client as mqtt
 from pprint import pprint
+try:
+    import orjson                       # optional: faster payload decode if installed
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads             # stdlib json also accepts the raw bytes payload
 
 
 #globals
 topic_prefix = 'RVC'
-msg_counter = 0
+UIREFRESH = 1.0         #min seconds between debug UI refreshes
+UIUpdate = threading.Event()     #set by _on_message when AliasData has new values
+AliasLock = threading.Lock()
 TargetTopics = {}
 MQTTNameToAliasName = {}
 AllData = {}
 AliasData = {}
 client = None
+CONNECTTRIES = 5       #attempts to reach the broker before exiting
 mode = 'sub'
 debug = 0
+CACHE_SUFFIX = '.cache.pkl'      # parsed json topic tables are cached next to the json file
+
+
+def _read_topic_cache(cachefile, cachekey):
+    # returns the cached (AllData, TargetTopics, MQTTNameToAliasName, AliasData) or None if stale/missing
+    if cachekey is None:
+        return None
+    try:
+        with open(cachefile, "rb") as f:
+            (key, tables) = pickle.load(f)
+        if key != cachekey:
+            return None
+        (alldata, targettopics, nametoalias, aliasdata) = tables
+    except Exception:
+        # a missing, truncated or foreign cache file just means parsing the json again
+        return None
+    return (alldata, targettopics, nametoalias, aliasdata)
+
+def _write_topic_cache(cachefile, cachekey, tables):
+    # cache is only an optimization; a read-only filesystem just means parsing the json every start
+    if cachekey is None:
+        return
+    # write to a temp file and rename it into place so an interrupted write can't leave a partial cache
+    tmpfile = cachefile + '.tmp'
+    try:
+        with open(tmpfile, "wb") as f:
+            pickle.dump((cachekey, tables), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpfile, cachefile)
+    except OSError:
+        try:
+            os.remove(tmpfile)
+        except OSError:
+            pass
 
 class mqttclient():
 
@@ -23,33 +65,48 @@ class mqttclient():
         global client, AllData, AliasData, MQTTNameToAliasName, TargetTopics, mode
 
         mode = initmode
-        # read in the json file that defines the topics and variables of interest
-        try:    
-            with open(mqtttopicjsonfile,"r") as newfile: 
-                try:
+        # reuse the topic tables built on a previous start if neither the json file nor this module (the code that
+        # builds the tables) has changed
+        cachefile = mqtttopicjsonfile + CACHE_SUFFIX
+        try:
+            st = os.stat(mqtttopicjsonfile)
+            codest = os.stat(__file__)
+            cachekey = (st.st_mtime_ns, st.st_size, codest.st_mtime_ns, codest.st_size, varIDstr, topic_prefix)
+        except OSError:
+            cachekey = None
+        cached = _read_topic_cache(cachefile, cachekey)
+        if cached is not None:
+            AllData, TargetTopics, MQTTNameToAliasName, AliasData = cached
+        else:
+            # read in the json file that defines the topics and variables of interest
+            try:    
+                with open(mqtttopicjsonfile,"r") as newfile: 
                     AllData = json.load(newfile)
-                except: 
-                    print('Json file format error --- exiting')
-                    exit()
-        except:
-            print('dgn_variables.json file not found -- exiting')
-            exit()
-
-        for item in AllData:
-            if "instance" in AllData[item]:
-                topic = topic_prefix + '/' + item + '/' + str(AllData[item]["instance"])
-            else:   
-                topic = topic_prefix + '/' + item
-            for entryvar in AllData[item]:
-                tmp = AllData[item][entryvar]
-                if  isinstance(tmp, str) and tmp.startswith(varIDstr):
-                    if topic not in TargetTopics:
-                        TargetTopics[topic] = {}
-                    TargetTopics[topic][entryvar] = tmp
-                    local_topic = topic + '/' + entryvar
-                    AliasData[tmp] = ''
-                    MQTTNameToAliasName[local_topic] = tmp
-        if debug > 0:
+            except FileNotFoundError:
+                print(mqtttopicjsonfile, 'file not found -- exiting')
+                sys.exit(2)
+            except json.JSONDecodeError as e:
+                print('Json file format error --- exiting', e)
+                sys.exit(2)
+
+            idlen = len(varIDstr)            # var id prefix is compared by slice instead of startswith
+            for item in AllData:
+                if "instance" in AllData[item]:
+                    topic = topic_prefix + '/' + item + '/' + str(AllData[item]["instance"])
+                else:   
+                    topic = topic_prefix + '/' + item
+                for entryvar in AllData[item]:
+                    tmp = AllData[item][entryvar]
+                    if type(tmp) is str and tmp[:idlen] == varIDstr:
+                        if topic not in TargetTopics:
+                            TargetTopics[topic] = {}
+                        TargetTopics[topic][entryvar] = tmp
+                        local_topic = topic + '/' + entryvar
+                        AliasData[tmp] = ''
+                        MQTTNameToAliasName[local_topic] = tmp
+            _write_topic_cache(cachefile, cachekey, (AllData, TargetTopics, MQTTNameToAliasName, AliasData))
+        if debug > 1:
+            # startup dump of the static topic tables is only useful when chasing a json/topic problem
             #print('>>All Data:')
             #pprint(AllData)
             print('>>TargetTopics:')
@@ -65,11 +122,18 @@ class mqttclient():
         client.on_connect = self._on_connect
         client.on_message = self._on_message
 
-        try:
-            client.connect(mqttbroker,mqttport, 60)
-        except:
-            print("Can't connect to MQTT Broker/port -- exiting",mqttbroker,":",mqttport)
-            exit()
+        # back off between attempts so a broker that is still starting doesn't cause a restart storm
+        for attempt in range(CONNECTTRIES):
+            try:
+                client.connect(mqttbroker,mqttport, 60)
+                break
+            except OSError as e:
+                print("Can't connect to MQTT Broker/port",mqttbroker,":",mqttport, e)
+                if attempt < CONNECTTRIES - 1:
+                    time.sleep(min(2**attempt, 30))
+        else:
+            print("Giving up on MQTT Broker/port -- exiting",mqttbroker,":",mqttport)
+            sys.exit(2)
 
         
 
@@ -96,28 +160,35 @@ class mqttclient():
 
     # The callback for when a PUBLISH message is received from the MQTT server.
     def _on_message(self, client, userdata, msg):
-        global TargetTopics, msg_counter, AliasData, MQTTNameToAliasName
+        global TargetTopics, AliasData, MQTTNameToAliasName
         if debug>2:
             print(msg.topic+ " " + str(msg.payload))
-        msg_dict = json.loads(msg.payload.decode('utf-8'))
+        msg_dict = json_loads(msg.payload)
 
-        for item in TargetTopics[msg.topic]:
-            if item == 'instance':
-                break
-            if debug>2:
-                print('*** ',item,'= ', msg_dict[item])
-            tmp = msg.topic + '/' + item
-            AliasData[MQTTNameToAliasName[tmp]] = msg_dict[item]
+        with AliasLock:
+            for item in TargetTopics[msg.topic]:
+                if item == 'instance':
+                    break
+                if debug>2:
+                    print('*** ',item,'= ', msg_dict[item])
+                tmp = msg.topic + '/' + item
+                AliasData[MQTTNameToAliasName[tmp]] = msg_dict[item]
 
         if debug > 0 and debug < 3:
-            #This is a poor way to provide a UI but tkinter isn't working
-            msg_counter += 1
-            if msg_counter % 20 == 0:
-                #os.system('clear')
-                print('*******************************************************')
-                pprint(AliasData)
-                os.sys.stdout.flush()
-                msg_counter = 0
+            UIUpdate.set()
+
+    def _ui_loop(self):
+        # This is a poor way to provide a UI but tkinter isn't working
+        # Runs apart from paho's network thread so printing never holds up message dispatch
+        while True:
+            UIUpdate.wait()
+            UIUpdate.clear()
+            with AliasLock:
+                snapshot = dict(AliasData)
+            print('*******************************************************')
+            pprint(snapshot)
+            os.sys.stdout.flush()
+            time.sleep(UIREFRESH)
     
     def pub(self, payload, qos=0, retain=False):
         global client, debug, topic_prefix
@@ -136,7 +207,15 @@ class mqttclient():
                 
     def run_mqtt_infinite(self):
         global client
-        client.loop_forever()
+        # paho runs the network loop on its own thread, leaving this thread free for the debug UI
+        client.loop_start()
+        try:
+            if debug > 0 and debug < 3:
+                self._ui_loop()
+            else:
+                threading.Event().wait()
+        finally:
+            client.loop_stop()
 
 
 if __name__ == "__main__":
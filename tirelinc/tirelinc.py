@@ -4,6 +4,7 @@ from operator import truediv
 import sys
 import time 
 import json
+import re
 import asyncio
 import platform
 
@@ -24,12 +25,17 @@ logging.getLogger('BLEAK_LOGGING').setLevel(logging.DEBUG)
 #CONSTANTS
 TIRELINC_MAC = 'F4:CF:A2:85:D0:62'
 CHARACTERISTIC_UUID = '00000000-00b7-4807-beee-e0b0879cf3dd'      #timrelinc sERVICE GATT Characteristic UUID
+PUBHEARTBEAT = 30      #seconds; republish an unchanged reading at least this often so subscribers can spot a stale feed
+#CSV record fields used: 0 volts*100, 5 temp, 7 amps, 8 percent full, 9 status; the rest are skipped
+RECORD_RE = re.compile(rb'([^,]*),[^,]*,[^,]*,[^,]*,[^,]*,([^,]*),[^,]*,([^,]*),([^,]*),([^,]*)')
 
 #variables
-LastMessage = ""
+LastMessage = bytearray()    #record reassembled from notification chunks; decoded once complete
 MsgCount = 0
 LastVolt = 0
 LastAmps = 0
+LastPublished = None    #(Volt, Amps, Full, Stat) last sent to mqtt
+LastPubTime = 0
 Debug = 0
 
 
@@ -38,6 +44,7 @@ def notification_handler_tirelinc(sender, data):
     #ideal to have msg format here
     
     global LastMessage, LastAmps, LastVolt, Debug, MsgCount
+    global LastPublished, LastPubTime
     global file_ptr
     
     # raw print of all data
@@ -48,17 +55,19 @@ def notification_handler_tirelinc(sender, data):
         else:
             print(" {0} {1} {2} {3} decoded: {4} ".format(len(LastMessage), len(data), data[0], data, data.decode("utf-8")))
 
-    LastMessage += data.decode("utf-8")
-    if data[len(data)-1] == 0x0A:  # end of record with 0x0A LF
+    LastMessage.extend(data)
+    if data[-1] == 0x0A:  # end of record with 0x0A LF
         if len(LastMessage) < 45:          # end of complete record with 40 or so bytes
-            FieldData = LastMessage.split(",")
+            FieldData = RECORD_RE.match(LastMessage)
+            if FieldData is None:
+                return                     # short record; wait for the next one
             CurTime = int(time.time())
-            Volt    = float(FieldData[0])/100
-            Temp    = int(FieldData[5])
-            Amps    = 2 * int(FieldData[7])  # 2x since only monitoring 1 of 2 batteries
+            Volt    = float(FieldData[1])/100
+            Temp    = int(FieldData[2])
+            Amps    = 2 * int(FieldData[3])  # 2x since only monitoring 1 of 2 batteries
             #NOTE: positive amps => charging and negative amps => discharging
-            Full    = int(FieldData[8])
-            Stat    = FieldData[9][0:6]
+            Full    = int(FieldData[4])
+            Stat    = FieldData[5][0:6].decode("utf-8")
 
             #Now publish to MQTT           
             """  target topic copied from json file provides easy tag IDs
@@ -80,7 +89,11 @@ def notification_handler_tirelinc(sender, data):
             AllData["Status"] = Stat
             
             if Debug < 2:
-                mqttpubclient.pub(AllData)
+                PubData = (Volt, Amps, Full, Stat)
+                if PubData != LastPublished or (CurTime - LastPubTime) >= PUBHEARTBEAT:
+                    mqttpubclient.pub(AllData)
+                    LastPublished = PubData
+                    LastPubTime = CurTime
             if Debug > 0:
                 if MsgCount % 20 == 0:
                     print("Time\t\tVolt\tTemp\tAmps\tFull\tStat")
@@ -97,7 +110,7 @@ def notification_handler_tirelinc(sender, data):
 
         #Reset Vars
         else:
-            LastMessage = ""
+            del LastMessage[:]
     
         
 
@@ -121,8 +134,8 @@ async def OneClient(address1, char_uuid):  # need unique address and service add
 
     try:
         await client1.start_notify(char_uuid, notification_handler_tirelinc)
-        while True:
-            await asyncio.sleep(5.0)
+        # data arrives through the notification callback; park here until cancelled
+        await asyncio.Event().wait()
     finally: 
         file_ptr.close()
         print(f"Disconnecting: {client1.is_connected}")       